@@ -1,16 +1,38 @@
-from flask import Flask, render_template, request, jsonify, session, send_from_directory
+from flask import Flask, render_template, request, session, send_from_directory, send_file, redirect
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
 from dotenv import load_dotenv
 import requests
-from newspaper import Article
 import json
 import re
-from datetime import datetime, timedelta
-from functools import wraps
+from datetime import datetime, timedelta, timezone
+from functools import wraps, partial
+from contextlib import contextmanager
 import time
 from gnews import GNews
+import feedparser
 import threading
+import hashlib
+import hmac
+import heapq
+from collections import deque
+import sys
+import gzip
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from bs4 import BeautifulSoup
+from scraper import scrape_article
+from thumbnails import thumbnail_cache, image_key
+from usage import token_accountant, estimate_tokens, QuotaExceeded
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 class HistoryManager:
     def __init__(self, session, key, max_items=10):
@@ -40,19 +62,22 @@ class RateLimiter:
         self.max_requests = max_requests
         self.time_window = time_window
         self.requests = {}
+        self.lock = threading.Lock()  # gthread workers call this from several threads
     
     def is_allowed(self, key):
         now = time.time()
-        self.cleanup(now)
-        
-        if key not in self.requests:
-            self.requests[key] = []
-        
-        self.requests[key].append(now)
-        
-        return len(self.requests[key]) <= self.max_requests
+        with self.lock:
+            self.cleanup(now)
+            
+            if key not in self.requests:
+                self.requests[key] = []
+            
+            self.requests[key].append(now)
+            
+            return len(self.requests[key]) <= self.max_requests
     
     def cleanup(self, now):
+        # Caller holds self.lock
         for key in list(self.requests.keys()):
             self.requests[key] = [t for t in self.requests[key] if now - t < self.time_window]
             if not self.requests[key]:
@@ -67,79 +92,295 @@ def rate_limit(limiter):
         @wraps(f)
         def wrapped(*args, **kwargs):
             if not limiter.is_allowed(request.remote_addr):
-                return jsonify({'error': 'Rate limit exceeded. Please try again later.'}), 429
+                return json_response({'error': 'Rate limit exceeded. Please try again later.'}), 429
             return f(*args, **kwargs)
         return wrapped
     return decorator
 
+class Overloaded(Exception):
+    def __init__(self, retry_after):
+        super().__init__('Service is busy. Please try again later.')
+        self.retry_after = retry_after
+
+# Adaptive concurrency limit for routes that wait on a slow upstream
+class AdmissionController:
+    def __init__(self, initial_limit, min_limit, max_limit, max_wait,
+                 latency_tolerance=2.0, backoff=0.75):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_wait = max_wait
+        self.latency_tolerance = latency_tolerance
+        self.backoff = backoff
+        self.in_flight = 0
+        self.waiting = 0          # requests blocked in acquire(), each holding a worker thread
+        self.busy = 0             # requests tied up on other slow work (scraping) before their call
+        self.avg_latency = None   # smoothed upstream latency
+        self.min_latency = None   # best recent latency, used as the no-load baseline
+        self.last_decrease = 0.0
+        self.condition = threading.Condition()
+
+    def acquire(self, slots=1):
+        """Take slots of the limit (at most the whole limit) and return how many were taken"""
+        deadline = time.monotonic() + self.max_wait
+        with self.condition:
+            if self.in_flight + min(slots, int(self.limit)) > int(self.limit):
+                # Waiters hold threads too; never let them eat into the reserved ones
+                if self.threads_held() >= self.max_limit:
+                    raise Overloaded(self.retry_after())
+                self.waiting += 1
+                try:
+                    while self.in_flight + min(slots, int(self.limit)) > int(self.limit):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise Overloaded(self.retry_after())
+                        self.condition.wait(remaining)
+                finally:
+                    self.waiting -= 1
+            taken = min(slots, int(self.limit))
+            self.in_flight += taken
+            return taken
+
+    def threads_held(self):
+        return self.in_flight + self.waiting + self.busy
+
+    @contextmanager
+    def occupy(self):
+        """Count a thread doing slow work outside any upstream call against the same thread cap"""
+        with self.condition:
+            if self.threads_held() >= self.max_limit:
+                raise Overloaded(self.retry_after())
+            self.busy += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.busy -= 1
+
+    def release(self, slots=1):
+        with self.condition:
+            self.in_flight -= slots
+            self.condition.notify_all()
+
+    @contextmanager
+    def slot(self):
+        """Hold one slot for the duration of a single upstream call"""
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def observe(self, latency, ok=True):
+        """Record one upstream call and adjust the limit (AIMD on the latency gradient)"""
+        with self.condition:
+            if self.avg_latency is None:
+                self.avg_latency = latency
+            else:
+                self.avg_latency = 0.8 * self.avg_latency + 0.2 * latency
+            if self.min_latency is None or latency < self.min_latency:
+                self.min_latency = latency
+            else:
+                # Let the baseline drift up slowly so one lucky call does not pin it
+                self.min_latency += 0.01 * (latency - self.min_latency)
+
+            now = time.monotonic()
+            if not ok or latency > self.latency_tolerance * self.min_latency:
+                # Back off at most once per round trip, not once per slow call
+                if now - self.last_decrease >= self.avg_latency:
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    self.last_decrease = now
+            else:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self.condition.notify_all()
+
+    def retry_after(self):
+        return max(1, int(round(self.avg_latency or 1)))
+
+def retry_later_response(e, status_code):
+    response = error_response(str(e), status_code)
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+def admission_control(controller):
+    def decorator(f):
+        @wraps(f)
+        def wrapped(*args, **kwargs):
+            try:
+                with controller.slot():
+                    return f(*args, **kwargs)
+            except Overloaded as e:
+                return retry_later_response(e, 503)
+        return wrapped
+    return decorator
+
+# gunicorn runs WORKER_THREADS threads per worker (see gunicorn.conf.py). DeepSeek-bound
+# routes may use all but RESERVED_THREADS of them, counting requests still queued for a
+# slot, so cheap routes always get served.
+WORKER_THREADS = int(os.getenv('WORKER_THREADS', 8))
+RESERVED_THREADS = 2
+deepseek_admission = AdmissionController(
+    initial_limit=max(1, (WORKER_THREADS - RESERVED_THREADS) // 2),
+    min_limit=1,
+    max_limit=max(1, WORKER_THREADS - RESERVED_THREADS),
+    max_wait=2.0  # seconds a request may queue before we shed it
+)
+
 load_dotenv()
 
 app = Flask(__name__)
+# Render (and Vercel) terminate HTTP at a proxy, so remote_addr would be the proxy's
+# address for every visitor. Trust that many X-Forwarded-For hops to recover the client,
+# which keys the rate limits and token budgets; set TRUSTED_PROXIES=0 when serving directly.
+TRUSTED_PROXIES = int(os.getenv('TRUSTED_PROXIES', 1))
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
 # Use environment variable for session key, fallback to random for development
 app.secret_key = os.getenv('FLASK_SECRET_KEY', os.urandom(24))
 DEEPSEEK_API_KEY = os.getenv('DEEPSEEK_API_KEY')
-DEEPSEEK_API_URL = "https://api.deepseek.com/v1/chat/completions"
+DEEPSEEK_API_URL = os.getenv('DEEPSEEK_API_URL', "https://api.deepseek.com/v1/chat/completions")
 
 if not DEEPSEEK_API_KEY:
     raise ValueError("DEEPSEEK_API_KEY environment variable is not set")
 
+DEEPSEEK_TIMEOUT = 60  # seconds; keeps a stuck upstream from pinning a thread until gunicorn kills it
+
+def usage_account():
+    """The (user, route) pair DeepSeek usage is charged to for the current request"""
+    return (request.remote_addr, request.endpoint)
+
+def deepseek_chat(messages, temperature, max_tokens, timeout=DEEPSEEK_TIMEOUT, account=None):
+    """Call the DeepSeek chat API, charging usage to account and reporting latency for admission control"""
+    # Hold the worst-case estimate against the budget until the real usage is known
+    reservation = token_accountant.reserve(account[0], estimate_tokens(messages, max_tokens)) if account else None
+    
+    headers = {
+        "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
+        "Content-Type": "application/json"
+    }
+    started = time.monotonic()
+    try:
+        try:
+            response = requests.post(
+                DEEPSEEK_API_URL,
+                headers=headers,
+                json={
+                    "model": "deepseek-chat",
+                    "messages": messages,
+                    "temperature": temperature,
+                    "max_tokens": max_tokens
+                },
+                timeout=timeout
+            )
+            response.raise_for_status()
+        except requests.exceptions.RequestException:
+            deepseek_admission.observe(time.monotonic() - started, ok=False)
+            raise
+        deepseek_admission.observe(time.monotonic() - started)
+        
+        result = response.json()
+        content = result['choices'][0]['message']['content']
+    except Exception:
+        if reservation is not None:
+            token_accountant.release(reservation)
+        raise
+    
+    usage = result.get('usage') or {}
+    if account:
+        user, route = account
+        token_accountant.record(user, route, usage.get('prompt_tokens', 0), usage.get('completion_tokens', 0), reservation)
+    return content
+
+# Responses smaller than this are not worth compressing
+COMPRESS_MIN_SIZE = 500
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/html', 'text/plain', 'text/css', 'application/javascript'}
+
+def dumps_json(data):
+    """Serialize data to UTF-8 JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def json_response(data, status_code=200):
+    return app.response_class(dumps_json(data), status=status_code, mimetype='application/json')
+
+def compress_body(body, encoding, static=False):
+    if encoding == 'br':
+        return brotli.compress(body, quality=11 if static else 4)
+    return gzip.compress(body, compresslevel=9 if static else 6)
+
+def compress_variants(body, static=False):
+    """Pre-encode a body once for every content coding we can serve"""
+    variants = {'identity': body, 'gzip': compress_body(body, 'gzip', static)}
+    if brotli is not None:
+        variants['br'] = compress_body(body, 'br', static)
+    return variants
+
+def negotiate_encoding(available):
+    offered = [encoding for encoding in ('br', 'gzip') if encoding in available]
+    return request.accept_encodings.best_match(offered) or 'identity'
+
+def encoded_response(variants, mimetype, status_code=200):
+    """Serve the best precompressed variant the client accepts"""
+    encoding = negotiate_encoding(variants)
+    response = app.response_class(variants[encoding], status=status_code, mimetype=mimetype)
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Compress dynamic responses that were not already encoded"""
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding(['gzip'] + (['br'] if brotli is not None else []))
+    body = response.get_data()
+    if encoding == 'identity' or len(body) < COMPRESS_MIN_SIZE:
+        return response
+    response.set_data(compress_body(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+# Templates are static, so render and compress them once at startup
+static_pages = {}
+
+def build_static_pages():
+    with app.app_context():
+        for name in ('index.html', 'instagram.html', 'login.html', 'trending_kpop.html'):
+            body = render_template(name).encode('utf-8')
+            static_pages[name] = compress_variants(body, static=True)
+
+def static_page(name):
+    if app.debug or name not in static_pages:
+        # Pick up template edits while developing
+        with app.app_context():
+            static_pages[name] = compress_variants(render_template(name).encode('utf-8'), static=True)
+    return encoded_response(static_pages[name], 'text/html')
+
+build_static_pages()
+
 class APIError(Exception):
     def __init__(self, message, status_code=400):
         super().__init__(message)
         self.status_code = status_code
 
 def error_response(message, status_code=400):
-    return jsonify({
+    return json_response({
         'success': False,
         'error': message
-    }), status_code
+    }, status_code)
 
 def success_response(data):
-    return jsonify({
+    return json_response({
         'success': True,
         **data
     })
 
-def clean_article_text(text):
-    # Remove common promotional phrases and irrelevant content
-    promotional_patterns = [
-        r"Follow us on \w+",
-        r"Like us on \w+",
-        r"Subscribe to our \w+",
-        r"Click here to \w+",
-        r"Don't forget to \w+",
-        r"Check out our \w+",
-        r"Read more: https?://\S+",
-        r"Source: https?://\S+",
-        r"Credit: \S+",
-        r"Image: \S+",
-        r"Photo: \S+",
-        r"Advertisement",
-        r"Sponsored",
-        r"Related Articles:",
-        r"You might also like:",
-        r"Share this article",
-        r"Tags:",
-        r"\[.*?\]",  # Remove content in square brackets
-        r"https?://\S+",  # Remove URLs
-    ]
-    
-    # Apply each pattern
-    for pattern in promotional_patterns:
-        text = re.sub(pattern, '', text, flags=re.IGNORECASE)
-    
-    # Remove multiple newlines and spaces
-    text = re.sub(r'\n\s*\n', '\n\n', text)
-    text = re.sub(r' +', ' ', text)
-    
-    # Remove lines that are too short (likely navigation elements or single words)
-    lines = [line.strip() for line in text.split('\n') if len(line.strip()) > 30]
-    
-    # Join the lines back together
-    text = '\n\n'.join(lines)
-    
-    return text.strip()
-
 def get_kpop_prompt(original_text):
     return f"""You are a professional K-pop news article writer with extensive experience in writing for major K-pop news websites. 
     Rewrite the following article in an engaging and professional K-pop news style while maintaining accuracy and adding relevant context where appropriate. 
@@ -180,25 +421,15 @@ def rewrite_article(text, url='', title=''):
         if not text:
             raise APIError("No text provided for rewriting")
             
-        headers = {
-            "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
-            "model": "deepseek-chat",
-            "messages": [
+        result = deepseek_chat(
+            [
                 {"role": "system", "content": "You are a professional K-pop news article writer. Format your responses in Markdown. NEVER add statements or quotes that are not in the original article."},
                 {"role": "user", "content": get_kpop_prompt(text)}
             ],
-            "temperature": 0.7,
-            "max_tokens": 2000
-        }
-        
-        response = requests.post(DEEPSEEK_API_URL, headers=headers, json=data)
-        response.raise_for_status()
-        
-        result = response.json()['choices'][0]['message']['content']
+            temperature=0.7,
+            max_tokens=2000,
+            account=usage_account()
+        )
         
         history_manager = HistoryManager(session, 'article_history')
         history_item = {
@@ -211,60 +442,24 @@ def rewrite_article(text, url='', title=''):
         history_manager.add_item(history_item)
         
         return result
+    except (APIError, QuotaExceeded):
+        raise
     except requests.exceptions.RequestException as e:
         raise APIError(f"API request failed: {str(e)}", 503)
     except Exception as e:
         raise APIError(str(e))
 
-def scrape_article(url):
-    try:
-        if not url or not url.startswith(('http://', 'https://')):
-            return {'error': 'Invalid URL. Please provide a valid HTTP or HTTPS URL.'}
-            
-        article = Article(url)
-        article.download()
-        article.parse()
-        
-        # Get the title and main text content
-        title = article.title
-        text = article.text
-        
-        if not title or not text:
-            return {'error': 'Could not extract content from the provided URL.'}
-        
-        # Clean the article content
-        cleaned_text = clean_article_text(text)
-        
-        if not cleaned_text:
-            return {'error': 'No usable content found after cleaning the article.'}
-        
-        # Add title at the beginning
-        full_article = f"{title}\n\n{cleaned_text}"
-        
-        return {
-            'text': full_article,
-            'url': url,
-            'title': title
-        }
-    except Exception as e:
-        error_message = str(e)
-        if 'Failed to download' in error_message:
-            return {'error': 'Could not access the URL. Please check if the URL is correct and accessible.'}
-        elif 'Timeout' in error_message:
-            return {'error': 'Request timed out. Please try again.'}
-        else:
-            return {'error': f'An error occurred while processing the article: {error_message}'}
-
 @app.route('/login')
 def login():
-    return render_template('login.html')
+    return static_page('login.html')
 
 @app.route('/')
 def home():
-    return render_template('index.html')
+    return static_page('index.html')
 
 @app.route('/rewrite', methods=['POST'])
 @rate_limit(api_limiter)
+@admission_control(deepseek_admission)
 def rewrite():
     try:
         data = request.json
@@ -273,11 +468,23 @@ def rewrite():
         title = data.get('title', '')
         rewritten = rewrite_article(text, url, title)
         return success_response({'result': rewritten})
+    except QuotaExceeded as e:
+        return retry_later_response(e, 429)
     except APIError as e:
         return error_response(str(e), e.status_code)
     except Exception as e:
         return error_response(str(e))
 
+USAGE_ADMIN_TOKEN = os.getenv('USAGE_ADMIN_TOKEN')
+
+@app.route('/api/usage')
+def get_usage():
+    """DeepSeek token usage for the caller, or for everyone with the admin token"""
+    admin_token = request.headers.get('X-Admin-Token')
+    if USAGE_ADMIN_TOKEN and admin_token and hmac.compare_digest(admin_token, USAGE_ADMIN_TOKEN):
+        return success_response(token_accountant.report())
+    return success_response(token_accountant.report(user=request.remote_addr))
+
 @app.route('/scrape', methods=['POST'])
 @rate_limit(scrape_limiter)
 def scrape():
@@ -285,57 +492,62 @@ def scrape():
     url = data.get('url', '')
     result = scrape_article(url)
     if isinstance(result, dict):
-        return jsonify(result)
+        return json_response(result)
     else:
-        return jsonify({'error': result})
+        return json_response({'error': result})
 
 @app.route('/history', methods=['GET'])
 def get_history():
     history_manager = HistoryManager(session, 'article_history')
-    return jsonify({'history': history_manager.get_items()})
+    return json_response({'history': history_manager.get_items()})
 
 @app.route('/history/delete/<int:index>', methods=['DELETE'])
 def delete_history_item(index):
     history_manager = HistoryManager(session, 'article_history')
     if history_manager.delete_item(index):
-        return jsonify({'success': True})
+        return json_response({'success': True})
     else:
-        return jsonify({'success': False, 'error': 'Item not found'}), 400
+        return json_response({'success': False, 'error': 'Item not found'}), 400
 
 @app.route('/instagram')
 def instagram():
-    return render_template('instagram.html')
+    return static_page('instagram.html')
 
 @app.route('/instagram_history', methods=['GET'])
 def get_instagram_history():
     history_manager = HistoryManager(session, 'instagram_history')
-    return jsonify({'history': history_manager.get_items()})
+    return json_response({'history': history_manager.get_items()})
 
 @app.route('/instagram_history/delete/<int:index>', methods=['DELETE'])
 def delete_instagram_history_item(index):
     history_manager = HistoryManager(session, 'instagram_history')
     if history_manager.delete_item(index):
-        return jsonify({'success': True})
+        return json_response({'success': True})
     else:
-        return jsonify({'success': False, 'error': 'Item not found'}), 400
+        return json_response({'success': False, 'error': 'Item not found'}), 400
+
+def strip_code_fences(content):
+    return re.sub(r'^```\w*\n|```$', '', content, flags=re.MULTILINE).strip()
+
+def clean_headlines(headlines):
+    if isinstance(headlines, str):
+        headlines = [headlines]
+    headlines = [str(h).strip() for h in headlines]
+    headlines = [re.sub(r'\s+', ' ', h) for h in headlines]
+    headlines = [h[:77] + "..." if len(h) > 80 else h for h in headlines]
+    return [h for h in headlines if h.strip()][:3]
 
 def parse_instagram_content(content):
     """Parse and validate Instagram content from AI response"""
     try:
         # Remove code block markers if present
-        content = re.sub(r'^```\w*\n|```$', '', content, flags=re.MULTILINE).strip()
+        content = strip_code_fences(content)
         
         # Parse JSON content
         data = json.loads(content)
         
         # Validate and clean headlines
-        headlines = data.get('headlines', [])
-        if isinstance(headlines, str):
-            headlines = [headlines]
-        headlines = [str(h).strip() for h in headlines]
-        headlines = [re.sub(r'\s+', ' ', h) for h in headlines]
-        headlines = [h[:77] + "..." if len(h) > 80 else h for h in headlines]
-        headlines = [h for h in headlines if h.strip()][:3]
+        headlines = clean_headlines(data.get('headlines', []))
         
         # Validate and clean captions
         captions = data.get('captions', [])
@@ -366,8 +578,9 @@ def generate_instagram():
         data = request.json
         url = data.get('url', '')
         
-        # Scrape the article
-        article_data = scrape_article(url)
+        # Scrape the article; a slow host ties up this thread, so it counts against the cap
+        with deepseek_admission.occupy():
+            article_data = scrape_article(url)
         if 'error' in article_data:
             raise APIError(article_data['error'])
         
@@ -410,27 +623,17 @@ def generate_instagram():
     ]
 }}"""
         
-        headers = {
-            "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
-        response = requests.post(
-            DEEPSEEK_API_URL,
-            headers=headers,
-            json={
-                "model": "deepseek-chat",
-                "messages": [
+        # Only the DeepSeek call counts against the admission limit, not the scrape
+        with deepseek_admission.slot():
+            content = deepseek_chat(
+                [
                     {"role": "system", "content": "You are a K-pop social media manager. Respond only with the requested JSON format."},
                     {"role": "user", "content": prompt}
                 ],
-                "temperature": 0.65,
-                "max_tokens": 1000
-            }
-        )
-        
-        response.raise_for_status()
-        content = response.json()['choices'][0]['message']['content']
+                temperature=0.65,
+                max_tokens=1000,
+                account=usage_account()
+            )
         
         # Parse and validate the content
         instagram_content = parse_instagram_content(content)
@@ -447,6 +650,10 @@ def generate_instagram():
         
         return success_response(instagram_content)
         
+    except Overloaded as e:
+        return retry_later_response(e, 503)
+    except QuotaExceeded as e:
+        return retry_later_response(e, 429)
     except requests.exceptions.RequestException as e:
         return error_response(f"API request failed: {str(e)}", 503)
     except APIError as e:
@@ -454,12 +661,535 @@ def generate_instagram():
     except Exception as e:
         return error_response(str(e))
 
+# Parallel mode: the headline set and each caption are separate, smaller calls
+INSTAGRAM_CALL_TIMEOUT = 30  # seconds per DeepSeek call
+INSTAGRAM_RETRIES = 1  # extra attempts for a piece that failed or could not be parsed
+HEADLINE_MAX_TOKENS = 200
+CAPTION_MAX_TOKENS = 600
+CAPTION_FOCUSES = [
+    "Focus on news details and facts",
+    "Emphasize artist/group achievements and milestones",
+    "Create engagement through discussion points"
+]
+# Streams run at most as many calls as they hold admission slots, so this pool never queues
+instagram_executor = ThreadPoolExecutor(max_workers=deepseek_admission.max_limit, thread_name_prefix='instagram')
+
+def generate_headlines(article_data, account):
+    prompt = f"""As an expert K-pop social media manager, write Instagram headlines for this article.
+        
+        Article Title: {article_data['title']}
+        Article Content: {article_data['text']}
+        
+        Create THREE headlines following these guidelines:
+        - Keep headlines concise but impactful
+        - Focus on the key news or announcement
+        - Use engaging language that appeals to K-pop fans
+        - Maximum 80 characters per headline
+
+        Provide the headlines in this JSON format:
+{{
+    "headlines": ["First headline here", "Second headline here", "Third headline here"]
+}}"""
+    content = deepseek_chat(
+        [
+            {"role": "system", "content": "You are a K-pop social media manager. Respond only with the requested JSON format."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.65,
+        max_tokens=HEADLINE_MAX_TOKENS,
+        timeout=INSTAGRAM_CALL_TIMEOUT,
+        account=account
+    )
+    headlines = clean_headlines(json.loads(strip_code_fences(content)).get('headlines', []))
+    if not headlines:
+        raise ValueError("No headlines in AI response")
+    return headlines
+
+def generate_caption(article_data, focus, account):
+    prompt = f"""As an expert K-pop social media manager, write one Instagram caption for this article.
+        
+        Article Title: {article_data['title']}
+        Article Content: {article_data['text']}
+        
+        Caption Guidelines:
+        - {focus}
+        - Write a detailed, professional caption (200-300 words)
+        - NO emojis - maintain professional tone
+        - Include relevant hashtags at the end (max 5-6 hashtags)
+        - Use proper formatting with line breaks for readability
+        - Maintain journalistic integrity while appealing to fans
+        - Add context when necessary for international fans
+
+        Respond with the caption text only."""
+    caption = strip_code_fences(deepseek_chat(
+        [
+            {"role": "system", "content": "You are a K-pop social media manager. Respond only with the caption text."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.65,
+        max_tokens=CAPTION_MAX_TOKENS,
+        timeout=INSTAGRAM_CALL_TIMEOUT,
+        account=account
+    ))
+    if not caption:
+        raise ValueError("Empty caption in AI response")
+    return caption
+
+class StreamSlots:
+    """Admission slots held by one stream.
+
+    A slot whose DeepSeek call is still running when the stream closes (say the
+    client went away) stays taken until that call finishes; the rest go back on close.
+    """
+    def __init__(self, controller, count):
+        self.controller = controller
+        self.count = count
+        self.idle = count
+        self.lock = threading.Lock()
+
+    def hand_off(self, future):
+        """Let a running call keep its slot past close, releasing it when the call finishes"""
+        with self.lock:
+            self.idle -= 1
+        future.add_done_callback(lambda _: self.controller.release())
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, 0
+        if idle:
+            self.controller.release(idle)
+
+def stream_instagram_variants(article_data, account, slots):
+    """Run one piece per held slot at a time and yield NDJSON events as each one finishes"""
+    tasks = {'headlines': (generate_headlines, (account,))}
+    for index, focus in enumerate(CAPTION_FOCUSES):
+        tasks[f'caption:{index}'] = (generate_caption, (focus, account))
+    
+    def submit(name):
+        func, args = tasks[name]
+        return instagram_executor.submit(func, article_data, *args)
+    
+    attempts = {name: 1 for name in tasks}
+    queued = deque(tasks)
+    pending = {}
+    headlines = []
+    captions = [None] * len(CAPTION_FOCUSES)
+    
+    try:
+        while queued or pending:
+            while queued and len(pending) < slots.count:
+                name = queued.popleft()
+                pending[submit(name)] = name
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # Retry just this piece; the others keep going
+                    if attempts[name] <= INSTAGRAM_RETRIES:
+                        attempts[name] += 1
+                        queued.append(name)
+                    else:
+                        yield dumps_json({'type': 'error', 'part': name, 'error': str(e)}) + b'\n'
+                    continue
+                
+                if name == 'headlines':
+                    headlines = result
+                    yield dumps_json({'type': 'headlines', 'headlines': headlines}) + b'\n'
+                else:
+                    index = int(name.split(':')[1])
+                    captions[index] = result
+                    yield dumps_json({'type': 'caption', 'index': index, 'caption': result}) + b'\n'
+    finally:
+        # Stopped early: drop what has not started, keep counting what is still running
+        for future in pending:
+            if not future.cancel():
+                slots.hand_off(future)
+    
+    yield dumps_json({
+        'type': 'done',
+        'success': bool(headlines) or any(captions),
+        'headlines': headlines,
+        'captions': captions
+    }) + b'\n'
+
+@app.route('/generate_instagram/stream', methods=['POST'])
+@rate_limit(api_limiter)
+def generate_instagram_stream():
+    """Parallel variant of /generate_instagram that streams each piece as NDJSON"""
+    try:
+        data = request.json
+        url = data.get('url', '')
+        
+        # Scrape the article; a slow host ties up this thread, so it counts against the cap
+        with deepseek_admission.occupy():
+            article_data = scrape_article(url)
+        if 'error' in article_data:
+            raise APIError(article_data['error'])
+        
+        # Check the budget for all pieces up front, before the stream starts
+        account = usage_account()
+        article_tokens = estimate_tokens([{'content': article_data['text']}], 0)
+        token_accountant.check(
+            account[0],
+            article_tokens * (1 + len(CAPTION_FOCUSES)) + HEADLINE_MAX_TOKENS + CAPTION_MAX_TOKENS * len(CAPTION_FOCUSES)
+        )
+    except Overloaded as e:
+        return retry_later_response(e, 503)
+    except QuotaExceeded as e:
+        return retry_later_response(e, 429)
+    except APIError as e:
+        return error_response(str(e), e.status_code)
+    except Exception as e:
+        return error_response(str(e))
+    
+    # One slot per concurrent DeepSeek call, held until the stream is closed. When the
+    # limit is smaller than that, the stream gets the whole limit and runs fewer at once.
+    try:
+        slots = StreamSlots(deepseek_admission, deepseek_admission.acquire(1 + len(CAPTION_FOCUSES)))
+    except Overloaded as e:
+        return retry_later_response(e, 503)
+    
+    # The session cookie is sent before the body, so this mode leaves history to the client.
+    # Closing the response closes the generator first, so running calls are handed off
+    # before the idle slots go back.
+    response = app.response_class(stream_instagram_variants(article_data, account, slots), mimetype='application/x-ndjson')
+    response.call_on_close(slots.close)
+    return response
+
 # Cache for trending news
 trending_news_cache = {
     'data': [],
-    'last_updated': None
+    'last_updated': None,
+    'payload': None  # serialized and compressed API response, rebuilt once per refresh
 }
 
+# Keep a larger window now that the API can filter and paginate server-side
+TRENDING_CACHE_MAX_ARTICLES = 500
+# The unfiltered response keeps the old window so the page payload does not grow
+TRENDING_FULL_RESPONSE_MAX = 100
+TRENDING_PAGE_SIZE = 20
+TRENDING_MAX_PAGE_SIZE = 100
+
+# Canonical artist names and the aliases we match in titles
+KPOP_ARTISTS = {
+    'bts': ['bts', '방탄소년단', 'bangtan'],
+    'blackpink': ['blackpink', '블랙핑크'],
+    'newjeans': ['newjeans', '뉴진스'],
+    'seventeen': ['seventeen', '세븐틴'],
+    'twice': ['twice', '트와이스'],
+    'ive': ['ive', '아이브'],
+    'stray kids': ['stray kids', '스트레이 키즈'],
+    'le sserafim': ['le sserafim', '르세라핌'],
+    'enhypen': ['enhypen', '엔하이픈'],
+    'txt': ['txt', '투모로우바이투게더'],
+    'aespa': ['aespa', '에스파'],
+    'nct': ['nct', '엔시티'],
+    'red velvet': ['red velvet', '레드벨벳'],
+    'nmixx': ['nmixx', '엔믹스'],
+}
+
+GNEWS_DATE_FORMAT = '%a, %d %b %Y %H:%M:%S GMT'
+TRENDING_MAX_AGE = 24 * 60 * 60  # seconds
+
+class TrendingArticle:
+    """Normalized trending news item with its UTC publish time computed once at ingest"""
+    __slots__ = ('title', 'url', 'published_date', 'timestamp', 'publisher', 'source', 'image')
+
+    def __init__(self, title, url, published_date, timestamp, publisher, source, image):
+        self.title = title
+        self.url = url
+        self.published_date = published_date
+        self.timestamp = timestamp
+        # Only a handful of distinct publishers and sources, so share the strings
+        self.publisher = sys.intern(publisher)
+        self.source = sys.intern(source)
+        self.image = image
+
+    def to_dict(self):
+        return {
+            'title': self.title,
+            'url': self.url,
+            'published_date': self.published_date,
+            'publisher': self.publisher,
+            'source': self.source,
+            # Served from our thumbnail cache rather than hotlinked
+            'image': f'/img/{image_key(self.image)}' if self.image else None
+        }
+
+def parse_published_date(value):
+    """Return the UTC epoch for a GNews or ISO 8601 date string, or None"""
+    try:
+        return datetime.strptime(value, GNEWS_DATE_FORMAT).replace(tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        pass
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+def normalize_article(raw):
+    """Build a TrendingArticle from a scraped or GNews dict, or None if it has no usable date"""
+    # GNews uses 'published date', our scrapers use 'published_date'
+    published_date = raw.get('published date') or raw.get('published_date')
+    timestamp = parse_published_date(published_date) if published_date else None
+    if timestamp is None:
+        return None
+    
+    # GNews gives the publisher as {'href': ..., 'title': ...}
+    publisher = raw.get('publisher')
+    if isinstance(publisher, dict):
+        publisher = publisher.get('title')
+    
+    return TrendingArticle(
+        title=raw['title'],
+        url=raw['url'],
+        published_date=published_date,
+        timestamp=timestamp,
+        publisher=publisher or raw.get('source') or 'Unknown Source',
+        source=raw.get('source') or 'Google News',
+        image=raw.get('image')
+    )
+
+def tokenize(text):
+    return re.findall(r'\w+', (text or '').lower())
+
+def match_artists(title):
+    """Return canonical names of the artists mentioned in a title"""
+    tokens = ' ' + ' '.join(tokenize(title)) + ' '
+    return [name for name, aliases in KPOP_ARTISTS.items()
+            if any(f' {alias} ' in tokens for alias in aliases)]
+
+def query_terms(query):
+    """Search terms for a query, with artist aliases mapped to the canonical names the index holds"""
+    tokens = tokenize(query)
+    terms = set(tokens)
+    padded = ' ' + ' '.join(tokens) + ' '
+    for name in match_artists(query):
+        for alias in KPOP_ARTISTS[name]:
+            if f' {alias} ' in padded:
+                terms.difference_update(tokenize(alias))
+        terms.update(tokenize(name))
+    return terms
+
+class TrendingIndex:
+    """Inverted index over the trending news cache for server-side search"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.docs = {}        # url -> (article, cursor)
+        self.cursors = {}     # cursor -> url
+        self.terms = {}       # token -> set of urls
+        self.publishers = {}  # lowercased publisher -> set of urls
+        self.order = []       # urls in cache order (newest first)
+        self.rank = {}        # url -> position in order
+
+    def _terms_for(self, article):
+        terms = set(tokenize(article.title))
+        terms.update(tokenize(article.publisher))
+        for artist in match_artists(article.title):
+            terms.update(tokenize(artist))
+        return terms
+
+    def _add(self, article):
+        url = article.url
+        cursor = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+        self.docs[url] = (article, cursor)
+        self.cursors[cursor] = url
+        for term in self._terms_for(article):
+            self.terms.setdefault(term, set()).add(url)
+        self.publishers.setdefault(article.publisher.lower(), set()).add(url)
+
+    def _remove(self, url):
+        article, cursor = self.docs.pop(url)
+        self.cursors.pop(cursor, None)
+        for term in self._terms_for(article):
+            postings = self.terms.get(term)
+            if postings is not None:
+                postings.discard(url)
+                if not postings:
+                    del self.terms[term]
+        publisher = article.publisher.lower()
+        postings = self.publishers.get(publisher)
+        if postings is not None:
+            postings.discard(url)
+            if not postings:
+                del self.publishers[publisher]
+
+    def sync(self, articles):
+        """Bring the index in line with the cache, touching only changed articles"""
+        with self.lock:
+            urls = [article.url for article in articles]
+            current = set(urls)
+            for url in [url for url in self.docs if url not in current]:
+                self._remove(url)
+            for article in articles:
+                if article.url not in self.docs:
+                    self._add(article)
+            self.order = urls
+            self.rank = {url: i for i, url in enumerate(urls)}
+
+    def search(self, query=None, publisher=None, since=None, cursor=None, limit=TRENDING_PAGE_SIZE):
+        """Return (articles, next_cursor, total) matching all given filters"""
+        with self.lock:
+            candidates = None
+            postings = []
+            if query:
+                terms = query_terms(query)
+                if not terms:
+                    raise ValueError('Query has no searchable words')
+                for term in terms:
+                    postings.append(self.terms.get(term, set()))
+            if publisher:
+                postings.append(self.publishers.get(publisher.lower(), set()))
+            if postings:
+                postings.sort(key=len)
+                candidates = set(postings[0])
+                for other in postings[1:]:
+                    candidates &= other
+            if since is not None:
+                base = candidates if candidates is not None else self.docs
+                candidates = {url for url in base if self.docs[url][0].timestamp >= since}
+
+            total = len(self.order) if candidates is None else len(candidates)
+            start = 0
+            if cursor is not None:
+                if cursor not in self.cursors:
+                    raise ValueError('Unknown cursor')
+                start = self.rank[self.cursors[cursor]] + 1
+
+            page = []
+            for url in self.order[start:]:
+                if candidates is None or url in candidates:
+                    page.append(url)
+                    if len(page) > limit:
+                        break
+
+            next_cursor = self.docs[page[limit - 1]][1] if len(page) > limit else None
+            return [self.docs[url][0] for url in page[:limit]], next_cursor, total
+
+trending_index = TrendingIndex()
+
+def parse_since(value):
+    """Parse a ?since= value given as epoch seconds or an ISO 8601 date"""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    timestamp = parse_published_date(value)
+    if timestamp is None:
+        raise ValueError(f'Unrecognized date {value!r}')
+    return timestamp
+
+# Per-source latency tracking and hedged requests for the trending refresh
+UPSTREAM_TIMEOUT = 10  # seconds, for publication pages and Soompi
+GNEWS_TIMEOUT = 15  # overall, across GNews's own 429 retries
+GNEWS_FETCH_TIMEOUT = (5, 10)  # connect, read (seconds) for one RSS fetch
+HEDGE_MIN_SAMPLES = 5  # below this a source's p95 is not trusted yet
+HEDGE_DEFAULT_DELAY = 3.0  # seconds before hedging a source we know little about
+
+class LatencyHistogram:
+    """Recent fetch latencies for one upstream source"""
+    def __init__(self, size=100):
+        self.samples = deque(maxlen=size)
+        self.lock = threading.Lock()
+
+    def record(self, latency):
+        with self.lock:
+            self.samples.append(latency)
+
+    def percentile(self, pct):
+        with self.lock:
+            if len(self.samples) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+class HedgeBudget:
+    """Caps hedged duplicates to a fraction of upstream requests, across all refreshes"""
+    def __init__(self, ratio, max_tokens):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.lock = threading.Lock()
+
+    def on_request(self):
+        with self.lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def take(self):
+        with self.lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+gnews_session = requests.Session()
+gnews_session.headers.update({
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+})
+
+class TimeoutGNews(GNews):
+    """GNews with a socket timeout on the RSS fetch, which feedparser's own fetch lacks.
+
+    Without it a hung feed keeps its upstream_executor thread forever, long after
+    hedged_call has stopped waiting for it.
+    """
+    def _fetch_feed(self, url):
+        response = gnews_session.get(url, timeout=GNEWS_FETCH_TIMEOUT, proxies=self._proxy or None)
+        feed = feedparser.parse(response.content)
+        feed['status'] = response.status_code
+        return feed
+
+source_latency = {}  # source name -> LatencyHistogram
+source_latency_lock = threading.Lock()
+hedge_budget = HedgeBudget(ratio=0.1, max_tokens=3)
+upstream_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='upstream')
+
+def hedged_call(source, func, timeout):
+    """Run func, racing a duplicate once it runs past the source's p95; the first success wins"""
+    with source_latency_lock:
+        histogram = source_latency.setdefault(source, LatencyHistogram())
+    hedge_budget.on_request()
+    
+    started = time.monotonic()
+    deadline = started + timeout
+    futures = {upstream_executor.submit(func)}
+    hedge_delay = histogram.percentile(95) or HEDGE_DEFAULT_DELAY
+    hedged = False
+    last_error = None
+    
+    while futures:
+        now = time.monotonic()
+        if now >= deadline:
+            break
+        # Until we hedge, only wait as long as this source usually takes
+        wait_for = deadline - now if hedged else min(deadline, started + hedge_delay) - now
+        done, futures = wait(futures, timeout=max(0, wait_for), return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                result = future.result()
+            except Exception as e:
+                # Fast failures say nothing about how long a good response takes
+                last_error = e
+                continue
+            histogram.record(time.monotonic() - started)
+            return result
+        if not hedged and time.monotonic() - started >= hedge_delay:
+            hedged = True
+            if hedge_budget.take():
+                futures.add(upstream_executor.submit(func))
+    
+    if last_error is not None and not futures:
+        raise last_error
+    # Count the straggler at its full cost so the p95 reflects it
+    histogram.record(time.monotonic() - started)
+    # Every source is an HTTP fetch, so report it the way requests would
+    raise requests.exceptions.Timeout(f"{source} did not respond within {timeout} seconds")
+
 def fetch_trending_kpop_news():
     """Fetch trending K-pop news from multiple sources"""
     try:
@@ -479,19 +1209,19 @@ def fetch_trending_kpop_news():
 
         for url in publication_urls:
             try:
-                response = session.get(url, timeout=10)
+                # Determine publisher based on URL
+                publisher = 'Unknown'
+                if 'MKeRpQwwuYm0BA' in url:
+                    publisher = 'allkpop'
+                elif 'CAAqJAgKIh5DQklTRUFnTWFnd0tDbk52YjIxd2FTNWpiMjBvQUFQAQ' in url:
+                    publisher = 'Soompi'
+                elif 'ML-9lgswouOtAw' in url:
+                    publisher = 'Koreaboo'
+
+                response = hedged_call(f'google-news:{publisher}', partial(session.get, url, timeout=UPSTREAM_TIMEOUT), UPSTREAM_TIMEOUT)
                 if response.ok:
                     soup = BeautifulSoup(response.text, 'html.parser')
                     articles = soup.find_all('article')
-                    
-                    # Determine publisher based on URL
-                    publisher = 'Unknown'
-                    if 'MKeRpQwwuYm0BA' in url:
-                        publisher = 'allkpop'
-                    elif 'CAAqJAgKIh5DQklTRUFnTWFnd0tDbk52YjIxd2FTNWpiMjBvQUFQAQ' in url:
-                        publisher = 'Soompi'
-                    elif 'ML-9lgswouOtAw' in url:
-                        publisher = 'Koreaboo'
 
                     for article in articles:
                         try:
@@ -512,7 +1242,7 @@ def fetch_trending_kpop_news():
 
                             # Get timestamp if available
                             time_elem = article.find('time')
-                            published_date = datetime.now().isoformat()
+                            published_date = datetime.now(timezone.utc).isoformat()
                             if time_elem and time_elem.get('datetime'):
                                 published_date = time_elem['datetime']
 
@@ -542,7 +1272,7 @@ def fetch_trending_kpop_news():
                 continue
         
         # 2. Additional Google News search queries for broader coverage
-        google_news = GNews(
+        google_news = TimeoutGNews(
             language='en',
             country='US',
             period='1d',  # Last 24 hours
@@ -565,7 +1295,7 @@ def fetch_trending_kpop_news():
         # Add delay between queries to prevent rate limiting
         for query in search_queries:
             try:
-                results = google_news.get_news(query)
+                results = hedged_call('gnews', partial(google_news.get_news, query), GNEWS_TIMEOUT)
                 if results:
                     # Filter out non-K-pop news
                     filtered_results = []
@@ -592,9 +1322,10 @@ def fetch_trending_kpop_news():
             session.headers.update({'User-Agent': 'Mozilla/5.0'})
             
             # Get news from Soompi's K-pop news section specifically
-            soompi_response = session.get(
-                'https://www.soompi.com/category/k-pop', 
-                timeout=10
+            soompi_response = hedged_call(
+                'soompi',
+                partial(session.get, 'https://www.soompi.com/category/k-pop', timeout=UPSTREAM_TIMEOUT),
+                UPSTREAM_TIMEOUT
             )
             if soompi_response.ok:
                 soup = BeautifulSoup(soompi_response.text, 'html.parser')
@@ -607,7 +1338,7 @@ def fetch_trending_kpop_news():
                     url = article.find('a')['href']
                     if not url.startswith('http'):
                         url = 'https://www.soompi.com' + url
-                    date = article.find('time')['datetime'] if article.find('time') else datetime.now().isoformat()
+                    date = article.find('time')['datetime'] if article.find('time') else datetime.now(timezone.utc).isoformat()
                     image = article.find('img')['src'] if article.find('img') else None
                     all_news.append({
                         'title': title,
@@ -624,71 +1355,42 @@ def fetch_trending_kpop_news():
         except Exception as e:
             print(f"Unexpected error fetching from Soompi: {str(e)}")
 
-        # Process and sort news
-        now = datetime.now()
+        # Normalize once, then sort and filter on the precomputed UTC epoch
+        cutoff = time.time() - TRENDING_MAX_AGE
         filtered_news = []
+        seen_urls = set()
         
-        for article in all_news:
+        for raw in all_news:
             try:
-                # Handle different date formats
-                if isinstance(article, dict):
-                    pub_date = None
-                    published_date_str = None
-                    
-                    # Handle Google News format
-                    if 'published date' in article:
-                        try:
-                            pub_date = datetime.strptime(article['published date'], '%a, %d %b %Y %H:%M:%S GMT')
-                            published_date_str = article['published date']
-                        except ValueError:
-                            pass
-                    
-                    # Handle Soompi format
-                    if not pub_date and 'published_date' in article:
-                        try:
-                            pub_date = datetime.fromisoformat(article['published_date'].replace('Z', '+00:00'))
-                            published_date_str = article['published_date']
-                        except ValueError:
-                            pass
-                    
-                    # Only include recent articles (last 24 hours)
-                    if pub_date and now - pub_date <= timedelta(days=1):
-                        filtered_news.append({
-                            'title': article['title'],
-                            'url': article['url'],
-                            'published_date': published_date_str,
-                            'timestamp': pub_date.timestamp(),  # Add timestamp for easier sorting
-                            'publisher': article.get('publisher', {}).get('title', article.get('source', 'Unknown Source')),
-                            'source': article.get('source', 'Google News'),
-                            'image': article.get('image', None)
-                        })
+                article = normalize_article(raw)
+                # Only include recent articles (last 24 hours)
+                if article and article.timestamp >= cutoff and article.url not in seen_urls:
+                    seen_urls.add(article.url)
+                    filtered_news.append(article)
             except Exception as e:
                 print(f"Error processing article: {str(e)}")
                 continue
 
-        # Sort by timestamp (newest first)
-        filtered_news.sort(key=lambda x: x['timestamp'], reverse=True)
-        
-        # Remove timestamp from final output
-        for article in filtered_news:
-            article.pop('timestamp', None)
-
-        # Take top 50 most recent news
+        # Sort by timestamp (newest first) and take the 50 most recent
+        filtered_news.sort(key=lambda article: article.timestamp, reverse=True)
         filtered_news = filtered_news[:50]
 
         if filtered_news:
-            # Update cache only if we have new articles
-            if not trending_news_cache['data']:
-                trending_news_cache['data'] = filtered_news
-            else:
-                # Merge with existing articles, avoiding duplicates
-                existing_urls = {article['url'] for article in trending_news_cache['data']}
-                new_articles = [article for article in filtered_news if article['url'] not in existing_urls]
-                trending_news_cache['data'] = new_articles + trending_news_cache['data']
-                # Keep only the latest 100 articles
-                trending_news_cache['data'] = trending_news_cache['data'][:100]
+            # Merge with existing articles, avoiding duplicates. Both lists are
+            # already newest first, so a linear merge keeps the cache sorted.
+            existing = trending_news_cache['data']
+            existing_urls = {article.url for article in existing}
+            new_articles = [article for article in filtered_news if article.url not in existing_urls]
+            for article in new_articles:
+                if article.image:
+                    thumbnail_cache.register(article.image)
+            merged = heapq.merge(new_articles, existing, key=lambda article: -article.timestamp)
+            # Keep only the latest articles
+            trending_news_cache['data'] = list(merged)[:TRENDING_CACHE_MAX_ARTICLES]
             
+            trending_index.sync(trending_news_cache['data'])
             trending_news_cache['last_updated'] = datetime.now()
+            refresh_trending_payload()
         elif not trending_news_cache['data']:
             # Only if cache is empty, initialize with empty list
             trending_news_cache['data'] = []
@@ -700,47 +1402,126 @@ def fetch_trending_kpop_news():
             trending_news_cache['data'] = []
             trending_news_cache['last_updated'] = datetime.now()
 
+def refresh_trending_payload():
+    """Serialize the unfiltered trending response once so requests only pick a variant"""
+    trending_news_cache['payload'] = compress_variants(dumps_json({
+        'news': [article.to_dict() for article in trending_news_cache['data'][:TRENDING_FULL_RESPONSE_MAX]],
+        'last_updated': trending_news_cache['last_updated'].isoformat() if trending_news_cache['last_updated'] else None
+    }))
+
+# Only one refresh runs at a time; requests never start a second one
+trending_refresh_lock = threading.Lock()
+
+def refresh_trending_news():
+    """Refresh the cache unless another thread already is"""
+    if not trending_refresh_lock.acquire(blocking=False):
+        return
+    try:
+        fetch_trending_kpop_news()
+    finally:
+        trending_refresh_lock.release()
+
 def update_news_periodically():
     """Update news every 5 minutes"""
     while True:
-        fetch_trending_kpop_news()
+        refresh_trending_news()
         time.sleep(300)  # Sleep for 5 minutes (300 seconds)
 
 # Start the background update thread
 update_thread = threading.Thread(target=update_news_periodically, daemon=True)
 update_thread.start()
 
+def trending_cache_stale():
+    return not trending_news_cache['data'] or \
+       (trending_news_cache['last_updated'] and \
+        datetime.now() - trending_news_cache['last_updated'] > timedelta(minutes=5))
+
+def ensure_trending_news():
+    """Serve stale news rather than refreshing inline; only block when there is nothing at all"""
+    if not trending_news_cache['data']:
+        last_updated = trending_news_cache['last_updated']
+        with trending_refresh_lock:
+            # Whoever held the lock may have just done the refresh we were waiting for
+            if not trending_news_cache['data'] and trending_news_cache['last_updated'] == last_updated:
+                fetch_trending_kpop_news()
+    elif trending_cache_stale() and not trending_refresh_lock.locked():
+        threading.Thread(target=refresh_trending_news, daemon=True).start()
+
 @app.route('/trending-kpop')
 def trending_kpop():
     """Render the trending K-pop news page"""
-    if not trending_news_cache['data'] or \
-       (trending_news_cache['last_updated'] and \
-        datetime.now() - trending_news_cache['last_updated'] > timedelta(minutes=5)):
-        fetch_trending_kpop_news()
+    ensure_trending_news()
+    
+    return static_page('trending_kpop.html')
+
+IMAGE_MAX_AGE = 365 * 24 * 60 * 60
+
+@app.route('/img/<key>')
+def proxied_image(key):
+    """Serve the cached card thumbnail for a trending news image"""
+    if not re.fullmatch(r'[0-9a-f]{20}', key):
+        return error_response('Image not found', 404)
+    
+    path = thumbnail_cache.get(key)
+    if path is None:
+        # Not built yet (or cannot be): send the original now rather than holding a
+        # worker thread while it downloads; the next page load gets the thumbnail
+        source = thumbnail_cache.source(key)
+        if source:
+            response = redirect(source)
+            response.cache_control.no_store = True
+            return response
+        return error_response('Image not found', 404)
     
-    return render_template('trending_kpop.html', 
-                         news=trending_news_cache['data'],
-                         last_updated=trending_news_cache['last_updated'])
+    response = send_file(path, mimetype='image/jpeg', max_age=IMAGE_MAX_AGE, conditional=True)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
 
 @app.route('/api/trending-kpop')
 def get_trending_kpop():
     """API endpoint for getting trending news"""
     try:
-        # Always fetch new news when the API is called
-        fetch_trending_kpop_news()
+        # The background thread keeps the cache fresh; requests only nudge it when it falls behind
+        ensure_trending_news()
         
         if not trending_news_cache['data']:
-            return jsonify({
+            return json_response({
                 'error': 'No news available at the moment. Please try again later.'
             }), 404
         
-        return jsonify({
-            'news': trending_news_cache['data'],
-            'last_updated': trending_news_cache['last_updated'].isoformat() if trending_news_cache['last_updated'] else None
+        last_updated = trending_news_cache['last_updated'].isoformat() if trending_news_cache['last_updated'] else None
+        
+        # Without search or paging parameters, keep returning the newest articles as before
+        search_params = ('q', 'publisher', 'since', 'cursor', 'limit')
+        if not any(request.args.get(param) for param in search_params):
+            if trending_news_cache['payload'] is None:
+                refresh_trending_payload()
+            return encoded_response(trending_news_cache['payload'], 'application/json')
+        
+        try:
+            since = parse_since(request.args['since']) if request.args.get('since') else None
+            limit = int(request.args.get('limit', TRENDING_PAGE_SIZE))
+            limit = max(1, min(limit, TRENDING_MAX_PAGE_SIZE))
+            news, next_cursor, total = trending_index.search(
+                query=request.args.get('q'),
+                publisher=request.args.get('publisher'),
+                since=since,
+                cursor=request.args.get('cursor') or None,
+                limit=limit
+            )
+        except ValueError as e:
+            return json_response({'error': f'Invalid search parameters: {str(e)}'}), 400
+        
+        return json_response({
+            'news': [article.to_dict() for article in news],
+            'next_cursor': next_cursor,
+            'total': total,
+            'last_updated': last_updated
         })
     except Exception as e:
         print(f"Error in /api/trending-kpop: {str(e)}")
-        return jsonify({
+        return json_response({
             'error': 'An error occurred while fetching the news. Please try again later.'
         }), 500
 
@@ -1,6 +1,9 @@
+import os
+
 workers = 4
+threads = int(os.getenv("WORKER_THREADS", 8))  # app.py sizes admission control from the same variable
 bind = "0.0.0.0:10000"
 timeout = 120
-worker_class = "sync"
+worker_class = "gthread"
 accesslog = "-"
-errorlog = "-" 
\ No newline at end of file
+errorlog = "-"
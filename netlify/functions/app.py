@@ -1,46 +1,12 @@
 import json
-from newspaper import Article
-import re
+import os
+import sys
 
-def clean_article_text(text):
-    # Remove common promotional phrases and irrelevant content
-    promotional_patterns = [
-        r"Follow us on \w+",
-        r"Like us on \w+",
-        r"Subscribe to our \w+",
-        r"Click here to \w+",
-        r"Don't forget to \w+",
-        r"Check out our \w+",
-        r"Read more: https?://\S+",
-        r"Source: https?://\S+",
-        r"Credit: \S+",
-        r"Image: \S+",
-        r"Photo: \S+",
-        r"Advertisement",
-        r"Sponsored",
-        r"Related Articles:",
-        r"You might also like:",
-        r"Share this article",
-        r"Tags:",
-        r"\[.*?\]",  # Remove content in square brackets
-        r"https?://\S+",  # Remove URLs
-    ]
-    
-    # Apply each pattern
-    for pattern in promotional_patterns:
-        text = re.sub(pattern, '', text, flags=re.IGNORECASE)
-    
-    # Remove multiple newlines and spaces
-    text = re.sub(r'\n\s*\n', '\n\n', text)
-    text = re.sub(r' +', ' ', text)
-    
-    # Remove lines that are too short (likely navigation elements or single words)
-    lines = [line.strip() for line in text.split('\n') if len(line.strip()) > 30]
-    
-    # Join the lines back together
-    text = '\n\n'.join(lines)
-    
-    return text.strip()
+# The scraping core lives at the repository root and is shared with the Flask app.
+# Importing it at module level keeps its session, compiled rules and article cache
+# alive across warm invocations.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from scraper import scrape_article
 
 def handler(event, context):
     """Simple serverless function to handle article scraping"""
@@ -78,34 +44,15 @@ def handler(event, context):
             }
         
         # Scrape the article
-        article = Article(url)
-        article.download()
-        article.parse()
-        
-        # Get the title and main text content
-        title = article.title
-        text = article.text
+        result = scrape_article(url)
         
-        if not title or not text:
+        if 'error' in result:
             return {
                 'statusCode': 400,
                 'headers': {'Content-Type': 'application/json'},
-                'body': json.dumps({'error': 'Could not extract content from the provided URL.'})
+                'body': json.dumps({'error': result['error']})
             }
         
-        # Clean the article content
-        cleaned_text = clean_article_text(text)
-        
-        if not cleaned_text:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json'},
-                'body': json.dumps({'error': 'No usable content found after cleaning the article.'})
-            }
-        
-        # Add title at the beginning
-        full_article = f"{title}\n\n{cleaned_text}"
-        
         # Return success response
         return {
             'statusCode': 200,
@@ -115,11 +62,7 @@ def handler(event, context):
                 'Access-Control-Allow-Headers': 'Content-Type',
                 'Access-Control-Allow-Methods': 'POST, OPTIONS'
             },
-            'body': json.dumps({
-                'text': full_article,
-                'url': url,
-                'title': title
-            })
+            'body': json.dumps(result)
         }
         
     except json.JSONDecodeError:
@@ -0,0 +1,226 @@
+"""Article scraping shared by the Flask app and the Netlify function.
+
+Everything expensive to set up (the pooled HTTP session, compiled cleaning
+rules, the recent-articles cache) lives at module level so it is built once
+per process and reused by warm serverless invocations.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+from newspaper import Article
+
+# Remove common promotional phrases and irrelevant content
+PROMOTIONAL_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in [
+    r"Follow us on \w+",
+    r"Like us on \w+",
+    r"Subscribe to our \w+",
+    r"Click here to \w+",
+    r"Don't forget to \w+",
+    r"Check out our \w+",
+    r"Read more: https?://\S+",
+    r"Source: https?://\S+",
+    r"Credit: \S+",
+    r"Image: \S+",
+    r"Photo: \S+",
+    r"Advertisement",
+    r"Sponsored",
+    r"Related Articles:",
+    r"You might also like:",
+    r"Share this article",
+    r"Tags:",
+    r"\[.*?\]",  # Remove content in square brackets
+    r"https?://\S+",  # Remove URLs
+]]
+BLANK_LINES_RE = re.compile(r'\n\s*\n')
+SPACES_RE = re.compile(r' +')
+
+def clean_article_text(text):
+    # Apply each pattern
+    for pattern in PROMOTIONAL_PATTERNS:
+        text = pattern.sub('', text)
+
+    # Remove multiple newlines and spaces
+    text = BLANK_LINES_RE.sub('\n\n', text)
+    text = SPACES_RE.sub(' ', text)
+
+    # Remove lines that are too short (likely navigation elements or single words)
+    lines = [line.strip() for line in text.split('\n') if len(line.strip()) > 30]
+
+    # Join the lines back together
+    text = '\n\n'.join(lines)
+
+    return text.strip()
+
+# Limits for fetching article pages ourselves instead of via newspaper's download()
+ARTICLE_MAX_BYTES = 3 * 1024 * 1024
+ARTICLE_TIMEOUT = (5, 10)  # connect, read (seconds)
+ARTICLE_DEADLINE = 20  # seconds for the whole body
+ARTICLE_CHUNK_SIZE = 64 * 1024
+ARTICLE_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+META_CHARSET_RE = re.compile(rb'<meta[^>]+charset=["\']?([\w.:-]+)', re.IGNORECASE)
+
+class DownloadError(Exception):
+    pass
+
+def make_article_session():
+    article_session = requests.Session()
+    # One pool per host, reused across scrapes and threads
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=8)
+    article_session.mount('http://', adapter)
+    article_session.mount('https://', adapter)
+    article_session.headers.update({
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml;q=0.9,*/*;q=0.1'
+    })
+    return article_session
+
+article_session = make_article_session()
+
+def detect_charset(headers, head):
+    """Pick the page encoding once: HTTP header, then <meta charset>, then UTF-8"""
+    if 'charset=' in headers.get('Content-Type', '').lower():
+        return requests.utils.get_encoding_from_headers(headers)
+    match = META_CHARSET_RE.search(head)
+    if match:
+        return match.group(1).decode('ascii', 'ignore')
+    return 'utf-8'
+
+def fetch_bounded(url, content_types, max_bytes, what='article page', accept=None):
+    """Stream a URL through the shared session with a byte cap, returning (body, headers)"""
+    try:
+        headers = {'Accept': accept} if accept else None
+        with article_session.get(url, stream=True, timeout=ARTICLE_TIMEOUT, headers=headers) as response:
+            if not response.ok:
+                raise DownloadError('Could not access the URL. Please check if the URL is correct and accessible.')
+
+            # Reject from the headers alone, before any of the body is read
+            content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+            if content_type and not content_type.startswith(content_types):
+                raise DownloadError(f'The URL does not point to an {what} ({content_type}).')
+            content_length = response.headers.get('Content-Length')
+            if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+                raise DownloadError(f'The {what} is too large to process.')
+
+            # The read timeout only bounds a single recv, so a server dripping a few
+            # bytes at a time would never trip it. A watchdog shuts the socket down
+            # at the deadline, which unblocks whatever read is in progress.
+            timed_out = threading.Event()
+            def stop():
+                timed_out.set()
+                try:
+                    response.raw.shutdown()
+                except (ValueError, RuntimeError, OSError):
+                    pass  # already finished or released to the pool
+            watchdog = threading.Timer(ARTICLE_DEADLINE, stop)
+            watchdog.daemon = True
+            watchdog.start()
+            body = bytearray()
+            try:
+                for chunk in response.iter_content(ARTICLE_CHUNK_SIZE):
+                    body += chunk
+                    if len(body) > max_bytes:
+                        raise DownloadError(f'The {what} is too large to process.')
+            except requests.exceptions.RequestException:
+                if not timed_out.is_set():
+                    raise
+            finally:
+                watchdog.cancel()
+            if timed_out.is_set():
+                raise DownloadError('Request timed out. Please try again.')
+
+            if not body:
+                raise DownloadError('Could not extract content from the provided URL.')
+            return bytes(body), response.headers
+    except requests.exceptions.Timeout:
+        raise DownloadError('Request timed out. Please try again.')
+    except requests.exceptions.RequestException:
+        raise DownloadError('Could not access the URL. Please check if the URL is correct and accessible.')
+
+def download_html(url):
+    """Stream an article page with a byte cap and return it decoded"""
+    body, headers = fetch_bounded(url, ARTICLE_CONTENT_TYPES, ARTICLE_MAX_BYTES)
+    encoding = detect_charset(headers, body[:4096])
+    try:
+        return body.decode(encoding, errors='replace')
+    except LookupError:
+        return body.decode('utf-8', errors='replace')
+
+# Small LRU of recently scraped articles, keyed by URL
+class ArticleCache:
+    def __init__(self, max_items, ttl):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, url):
+        with self.lock:
+            entry = self.items.get(url)
+            if entry is None:
+                return None
+            stored_at, article = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self.items[url]
+                return None
+            self.items.move_to_end(url)
+            return dict(article)
+
+    def put(self, url, article):
+        with self.lock:
+            self.items[url] = (time.monotonic(), dict(article))
+            self.items.move_to_end(url)
+            while len(self.items) > self.max_items:
+                self.items.popitem(last=False)
+
+article_cache = ArticleCache(max_items=64, ttl=600)
+
+def scrape_article(url):
+    try:
+        if not url or not url.startswith(('http://', 'https://')):
+            return {'error': 'Invalid URL. Please provide a valid HTTP or HTTPS URL.'}
+
+        cached = article_cache.get(url)
+        if cached is not None:
+            return cached
+
+        article = Article(url)
+        article.set_html(download_html(url))
+        article.parse()
+
+        # Get the title and main text content
+        title = article.title
+        text = article.text
+
+        if not title or not text:
+            return {'error': 'Could not extract content from the provided URL.'}
+
+        # Clean the article content
+        cleaned_text = clean_article_text(text)
+
+        if not cleaned_text:
+            return {'error': 'No usable content found after cleaning the article.'}
+
+        # Add title at the beginning
+        full_article = f"{title}\n\n{cleaned_text}"
+
+        result = {
+            'text': full_article,
+            'url': url,
+            'title': title
+        }
+        article_cache.put(url, result)
+        return result
+    except DownloadError as e:
+        return {'error': str(e)}
+    except Exception as e:
+        error_message = str(e)
+        if 'Failed to download' in error_message:
+            return {'error': 'Could not access the URL. Please check if the URL is correct and accessible.'}
+        elif 'Timeout' in error_message:
+            return {'error': 'Request timed out. Please try again.'}
+        else:
+            return {'error': f'An error occurred while processing the article: {error_message}'}
@@ -0,0 +1,45 @@
+"""Shared setup: a local DeepSeek stub and the environment app reads at import time."""
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+class SlowDeepSeekStub(BaseHTTPRequestHandler):
+    delay = 0.0  # seconds, or a function of the request body returning seconds
+
+    def do_POST(self):
+        request_body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8')
+        delay = SlowDeepSeekStub.delay
+        time.sleep(delay(request_body) if callable(delay) else delay)
+        body = json.dumps({
+            'choices': [{'message': {'content': 'Rewritten article'}}],
+            'usage': {'prompt_tokens': 10, 'completion_tokens': 5}
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+stub = ThreadingHTTPServer(('127.0.0.1', 0), SlowDeepSeekStub)
+threading.Thread(target=stub.serve_forever, daemon=True).start()
+
+# app reads its configuration at import time, so set it before any test imports it
+os.environ['DEEPSEEK_API_URL'] = f'http://127.0.0.1:{stub.server_address[1]}/v1/chat/completions'
+os.environ.setdefault('DEEPSEEK_API_KEY', 'test-key')
+os.environ['USAGE_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'usage.sqlite3')
+os.environ['IMAGE_CACHE_DIR'] = tempfile.mkdtemp()
+os.environ['TOKEN_BUDGET'] = str(10 ** 9)
+
+@pytest.fixture
+def deepseek_stub():
+    SlowDeepSeekStub.delay = 0.0
+    yield SlowDeepSeekStub
+    SlowDeepSeekStub.delay = 0.0
@@ -0,0 +1,144 @@
+"""Admission control against a local DeepSeek stub whose latency we control."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import app
+
+controller = app.deepseek_admission
+client_ids = iter(range(1, 1 << 24))
+
+def rewrite():
+    # A distinct client address per call keeps api_limiter out of the way
+    n = next(client_ids)
+    client = app.app.test_client()
+    return client.post('/rewrite', json={'text': 'Some article text'},
+                       environ_base={'REMOTE_ADDR': f'10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}'})
+
+@pytest.fixture(autouse=True)
+def fresh_controller():
+    with controller.condition:
+        controller.limit = float(max(1, (app.WORKER_THREADS - app.RESERVED_THREADS) // 2))
+        controller.in_flight = 0
+        controller.waiting = 0
+        controller.busy = 0
+        controller.avg_latency = None
+        controller.min_latency = None
+        controller.last_decrease = 0.0
+
+def test_limit_shrinks_as_upstream_latency_rises(deepseek_stub):
+    for _ in range(5):
+        assert rewrite().status_code == 200
+    fast_limit = controller.limit
+
+    deepseek_stub.delay = 0.3
+    for _ in range(3):
+        assert rewrite().status_code == 200
+    assert controller.limit < fast_limit
+
+def test_excess_rewrites_are_shed_with_retry_after(deepseek_stub):
+    deepseek_stub.delay = 1.5
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        responses = list(pool.map(lambda _: rewrite(), range(16)))
+
+    statuses = [response.status_code for response in responses]
+    assert 200 in statuses
+    shed = [response for response in responses if response.status_code == 503]
+    assert shed
+    for response in shed:
+        assert int(response.headers['Retry-After']) >= 1
+
+def test_history_is_served_while_upstream_is_slow(deepseek_stub):
+    deepseek_stub.delay = 1.5
+    # Stand-in for one gunicorn gthread worker
+    with ThreadPoolExecutor(max_workers=app.WORKER_THREADS) as worker:
+        rewrites = [worker.submit(rewrite) for _ in range(2 * app.WORKER_THREADS)]
+
+        started = time.monotonic()
+        history = worker.submit(lambda: app.app.test_client().get('/history')).result(timeout=10)
+        elapsed = time.monotonic() - started
+
+        assert history.status_code == 200
+        assert elapsed < 1.0
+        for future in rewrites:
+            future.result()
+    assert controller.in_flight == 0 and controller.waiting == 0
+
+def test_rate_limiter_is_thread_safe():
+    limiter = app.RateLimiter(max_requests=5, time_window=0.001)
+    errors = []
+
+    def hammer(n):
+        try:
+            for i in range(2000):
+                limiter.is_allowed(f'{n}-{i % 7}')
+        except Exception as e:
+            errors.append(e)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(hammer, range(8)))
+    assert not errors
+
+class SlowArticleHost(BaseHTTPRequestHandler):
+    delay = 0.0
+
+    def do_GET(self):
+        time.sleep(SlowArticleHost.delay)
+        paragraph = '<p>' + 'The group announced a new album and a world tour for next year. ' * 5 + '</p>'
+        body = f'<html><head><title>Comeback news</title></head><body><article><h1>Comeback news</h1>{paragraph * 5}</article></body></html>'.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def article_host():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SlowArticleHost)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    SlowArticleHost.delay = 0.0
+
+def test_slow_scrapes_count_against_the_thread_cap(article_host):
+    SlowArticleHost.delay = 1.5
+    def generate(n):
+        client = app.app.test_client()
+        return client.post('/generate_instagram', json={'url': f'{article_host}/article/{n}'},
+                           environ_base={'REMOTE_ADDR': f'10.200.0.{n}'})
+
+    with ThreadPoolExecutor(max_workers=app.WORKER_THREADS) as worker:
+        scrapes = [worker.submit(generate, n) for n in range(2 * app.WORKER_THREADS)]
+
+        started = time.monotonic()
+        history = worker.submit(lambda: app.app.test_client().get('/history')).result(timeout=10)
+        elapsed = time.monotonic() - started
+
+        assert history.status_code == 200
+        assert elapsed < 1.0
+        statuses = [future.result().status_code for future in scrapes]
+    assert 503 in statuses
+    assert controller.busy == 0
+
+def test_closing_a_stream_early_keeps_running_calls_counted(deepseek_stub, article_host):
+    SlowArticleHost.delay = 0.0
+    controller.limit = float(controller.max_limit)
+    # The headline set fails fast (the stub does not answer in JSON); captions are slow
+    deepseek_stub.delay = lambda body: 1.0 if 'caption text' in body else 0.05
+
+    response = app.app.test_client().post('/generate_instagram/stream', json={'url': f'{article_host}/stream'},
+                                          environ_base={'REMOTE_ADDR': '10.201.0.1'}, buffered=False)
+    first = next(iter(response.response))
+    assert b'"error"' in first
+    response.close()
+
+    # The three captions are still calling DeepSeek and must still be counted
+    assert controller.in_flight == len(app.CAPTION_FOCUSES)
+    time.sleep(1.5)
+    assert controller.in_flight == 0
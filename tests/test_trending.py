@@ -0,0 +1,138 @@
+"""Trending news normalization, search index, cursor paging and upstream fetches."""
+import time
+from datetime import datetime, timezone
+
+import pytest
+import requests
+
+import app
+
+NOW = datetime(2026, 10, 19, 12, 0, tzinfo=timezone.utc).timestamp()
+
+def article(n, title, publisher='Soompi', age=0):
+    return app.TrendingArticle(
+        title=title,
+        url=f'https://example.com/{n}',
+        published_date='2026-10-19T12:00:00Z',
+        timestamp=NOW - age,
+        publisher=publisher,
+        source=f'{publisher} via Google News',
+        image=None
+    )
+
+@pytest.fixture
+def index():
+    index = app.TrendingIndex()
+    index.sync([
+        article(1, 'BTS announce world tour', age=10),
+        article(2, '방탄소년단 컴백 확정', publisher='allkpop', age=20),
+        article(3, 'BLACKPINK Jennie solo release', publisher='Koreaboo', age=30),
+        article(4, 'Stray Kids top the charts', age=40),
+        article(5, 'NewJeans return with new single', publisher='allkpop', age=50),
+    ])
+    return index
+
+def urls(articles):
+    return [a.url.rsplit('/', 1)[1] for a in articles]
+
+@pytest.mark.parametrize('value, expected', [
+    ('Mon, 19 Oct 2026 12:00:00 GMT', NOW),
+    ('2026-10-19T12:00:00Z', NOW),
+    ('2026-10-19T21:00:00+09:00', NOW),
+    ('2026-10-19T12:00:00', NOW),  # naive times are taken as UTC
+])
+def test_parse_published_date(value, expected):
+    assert app.parse_published_date(value) == expected
+
+def test_parse_published_date_rejects_garbage():
+    assert app.parse_published_date('yesterday') is None
+
+def test_normalize_gnews_article():
+    normalized = app.normalize_article({
+        'title': 'TWICE comeback',
+        'url': 'https://example.com/twice',
+        'published date': 'Mon, 19 Oct 2026 12:00:00 GMT',
+        'publisher': {'href': 'https://www.soompi.com', 'title': 'Soompi'}
+    })
+    assert normalized.timestamp == NOW
+    assert normalized.publisher == 'Soompi'
+    assert normalized.source == 'Google News'
+
+def test_normalize_scraped_article_with_timezone():
+    normalized = app.normalize_article({
+        'title': 'aespa news',
+        'url': 'https://example.com/aespa',
+        'published_date': '2026-10-19T21:00:00+09:00',
+        'publisher': 'Soompi',
+        'source': 'Soompi K-pop News',
+        'image': 'https://example.com/aespa.jpg'
+    })
+    assert normalized.timestamp == NOW
+    assert normalized.publisher == 'Soompi'
+    assert normalized.to_dict()['image'].startswith('/img/')
+
+def test_normalize_drops_undated_article():
+    assert app.normalize_article({'title': 'x', 'url': 'https://example.com/x', 'published_date': 'soon'}) is None
+
+@pytest.mark.parametrize('query', ['bts', 'BTS', '방탄소년단', 'bangtan'])
+def test_artist_aliases_match_both_ways(index, query):
+    news, _, total = index.search(query=query)
+    assert urls(news) == ['1', '2']
+    assert total == 2
+
+def test_multi_word_alias(index):
+    news, _, _ = index.search(query='스트레이 키즈')
+    assert urls(news) == ['4']
+
+def test_query_and_publisher_filters_combine(index):
+    news, _, total = index.search(query='bts', publisher='ALLKPOP')
+    assert urls(news) == ['2']
+    assert total == 1
+
+def test_since_filter(index):
+    news, _, _ = index.search(since=NOW - 25)
+    assert urls(news) == ['1', '2']
+
+def test_punctuation_only_query_is_rejected(index):
+    with pytest.raises(ValueError):
+        index.search(query='!!!')
+
+def test_cursor_paging_walks_every_article_once(index):
+    seen = []
+    cursor = None
+    while True:
+        news, cursor, total = index.search(cursor=cursor, limit=2)
+        seen.extend(urls(news))
+        assert total == 5
+        if cursor is None:
+            break
+    assert seen == ['1', '2', '3', '4', '5']
+
+def test_cursor_survives_new_articles(index):
+    first, cursor, _ = index.search(limit=2)
+    index.sync([article(6, 'IVE fan meeting', age=0)] + [a for a, _ in index.docs.values()])
+    rest, _, _ = index.search(cursor=cursor, limit=10)
+    assert urls(rest) == ['3', '4', '5']
+
+def test_unknown_cursor_is_rejected(index):
+    with pytest.raises(ValueError):
+        index.search(cursor='deadbeef')
+
+def test_removed_articles_leave_the_index(index):
+    index.sync([a for a, _ in index.docs.values() if a.url != 'https://example.com/1'])
+    news, _, total = index.search(query='bts')
+    assert urls(news) == ['2']
+    assert 'tour' not in index.terms
+
+def test_hedged_call_times_out_like_requests():
+    with pytest.raises(requests.exceptions.Timeout):
+        app.hedged_call('test-slow-source', lambda: time.sleep(1), timeout=0.2)
+
+def test_hedged_call_skips_failures_in_latency_samples():
+    def fail():
+        raise ValueError('upstream error')
+
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            app.hedged_call('test-failing-source', fail, timeout=1)
+    assert len(app.source_latency['test-failing-source'].samples) == 0
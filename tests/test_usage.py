@@ -0,0 +1,51 @@
+"""Token budgets: atomic reservations and who a call is charged to."""
+import os
+import tempfile
+import threading
+
+import pytest
+
+import app
+from usage import QuotaExceeded, TokenAccountant
+
+def test_concurrent_reservations_cannot_overshoot_the_budget():
+    path = os.path.join(tempfile.mkdtemp(), 'usage.sqlite3')
+    # One accountant per thread stands in for separate gunicorn workers
+    accountants = [TokenAccountant(path, budget=1000, window=3600) for _ in range(5)]
+    barrier = threading.Barrier(len(accountants))
+    reserved = []
+
+    def reserve(accountant):
+        barrier.wait()
+        try:
+            reserved.append(accountant.reserve('user', 900))
+        except QuotaExceeded:
+            pass
+
+    threads = [threading.Thread(target=reserve, args=(accountant,)) for accountant in accountants]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(reserved) == 1
+
+    accountant = accountants[0]
+    accountant.record('user', 'rewrite', 100, 50, reserved[0])
+    assert accountant.used('user') == 150
+    with pytest.raises(QuotaExceeded):
+        accountant.reserve('user', 900)
+
+def test_calls_are_charged_to_the_forwarded_client(deepseek_stub):
+    # Behind Render's proxy every request arrives from the proxy's address
+    client = app.app.test_client()
+    for forwarded in ['203.0.113.7', '198.51.100.1, 203.0.113.8']:
+        response = client.post('/rewrite', json={'text': 'Some article text'},
+                               headers={'X-Forwarded-For': forwarded},
+                               environ_base={'REMOTE_ADDR': '192.0.2.1'})
+        assert response.status_code == 200
+
+    assert app.token_accountant.report(user='203.0.113.7')['routes']['rewrite']['calls'] == 1
+    # Only the hop our proxy added is trusted; a client-supplied prefix is ignored
+    assert app.token_accountant.report(user='203.0.113.8')['routes']['rewrite']['calls'] == 1
+    assert app.token_accountant.report(user='198.51.100.1')['routes'] == {}
+    assert app.token_accountant.report(user='192.0.2.1')['routes'] == {}
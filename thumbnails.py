@@ -0,0 +1,164 @@
+"""Card-sized thumbnails for trending news images, cached on disk.
+
+Images are registered (and prefetched) when articles enter the trending
+cache, so /img/<key> only ever serves URLs we collected ourselves and page
+loads read local files instead of hotlinking the publishers.
+"""
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from scraper import DownloadError, fetch_bounded
+
+THUMBNAIL_SIZE = (640, 360)
+THUMBNAIL_QUALITY = 80
+IMAGE_MAX_BYTES = 8 * 1024 * 1024
+IMAGE_CACHE_DIR = os.getenv('IMAGE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'vintools-thumbnails'))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv('IMAGE_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+IMAGE_RETRY_AFTER = 600  # seconds before retrying an image that failed
+
+def image_key(url):
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()[:20]
+
+def make_thumbnail(data):
+    """Downscale an image to fit a news card and re-encode it as JPEG"""
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft('RGB', THUMBNAIL_SIZE)  # lets JPEG decode at reduced size
+        image = image.convert('RGB')
+        image.thumbnail(THUMBNAIL_SIZE)
+        output = io.BytesIO()
+        image.save(output, 'JPEG', quality=THUMBNAIL_QUALITY, optimize=True, progressive=True)
+        return output.getvalue()
+
+class ThumbnailCache:
+    def __init__(self, directory, max_bytes, workers=4):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.sources = {}   # key -> original image URL, mirrored to <key>.url for other workers
+        self.pending = {}   # key -> Future for thumbnails being built
+        self.failed = {}    # key -> time of the last failed build
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='thumbnail')
+        os.makedirs(directory, exist_ok=True)
+        self.total_bytes = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{key}.jpg')
+
+    def source_path(self, key):
+        return os.path.join(self.directory, f'{key}.url')
+
+    def write_file(self, path, data):
+        # Every gunicorn worker may write the same file at once, so each writes its
+        # own temp file and renames it into place; readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=os.path.basename(path) + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+        with self.lock:
+            self.total_bytes += len(data)
+
+    def register(self, url):
+        """Remember an image URL and start building its thumbnail; returns its key"""
+        key = image_key(url)
+        with self.lock:
+            self.sources[key] = url
+        if not os.path.exists(self.source_path(key)):
+            try:
+                self.write_file(self.source_path(key), url.encode('utf-8'))
+            except OSError as e:
+                print(f"Error saving image source for {url}: {str(e)}")
+        self.prefetch(key)
+        return key
+
+    def source(self, key):
+        """Original URL for a key, including keys registered by another worker"""
+        url = self.sources.get(key)
+        if url is None:
+            try:
+                with open(self.source_path(key), 'rb') as f:
+                    url = f.read().decode('utf-8')
+            except OSError:
+                return None
+            with self.lock:
+                self.sources[key] = url
+        return url
+
+    def prefetch(self, key):
+        url = self.source(key)
+        with self.lock:
+            if key in self.pending or os.path.exists(self.path(key)):
+                return self.pending.get(key)
+            if url is None or time.monotonic() - self.failed.get(key, -IMAGE_RETRY_AFTER) < IMAGE_RETRY_AFTER:
+                return None
+            future = self.executor.submit(self._build, key, url)
+            self.pending[key] = future
+        return future
+
+    def get(self, key):
+        """Return the thumbnail path if it is built; otherwise start building it and return None"""
+        path = self.path(key)
+        if os.path.exists(path):
+            return path
+        self.prefetch(key)
+        return None
+
+    def _build(self, key, url):
+        try:
+            data, _ = fetch_bounded(url, ('image/',), IMAGE_MAX_BYTES, what='image', accept='image/*')
+            self.write_file(self.path(key), make_thumbnail(data))
+            with self.lock:
+                over_budget = self.total_bytes > self.max_bytes
+            if over_budget:
+                self._evict()
+        except (DownloadError, OSError, Image.DecompressionBombError) as e:
+            print(f"Error building thumbnail for {url}: {str(e)}")
+            with self.lock:
+                self.failed[key] = time.monotonic()
+            raise
+        finally:
+            with self.lock:
+                self.pending.pop(key, None)
+
+    def _evict(self):
+        """Drop the least recently written images, with their sources, until we are under budget"""
+        with self.lock:
+            entries = {}  # key -> (newest mtime, total size, paths)
+            for entry in os.scandir(self.directory):
+                key, ext = os.path.splitext(entry.name)
+                if ext not in ('.jpg', '.url'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                mtime, size, paths = entries.get(key, (0.0, 0, []))
+                entries[key] = (max(mtime, stat.st_mtime), size + stat.st_size, paths + [entry.path])
+            total = sum(size for _, size, _ in entries.values())
+            target = self.max_bytes * 0.9
+            for key, (_, size, paths) in sorted(entries.items(), key=lambda item: item[1][0]):
+                if total <= target:
+                    break
+                for path in paths:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                self.sources.pop(key, None)
+                total -= size
+            self.total_bytes = total
+
+thumbnail_cache = ThumbnailCache(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES)
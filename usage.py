@@ -0,0 +1,187 @@
+"""DeepSeek token and cost accounting with rolling per-user budgets.
+
+Counters live in a small SQLite database so every gunicorn worker on the
+host shares them. Usage is stored in per-minute buckets, which keeps both
+the write (one upsert per call) and the budget check (one indexed range
+sum) cheap.
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+USAGE_DB_PATH = os.getenv('USAGE_DB_PATH', os.path.join(tempfile.gettempdir(), 'vintools-usage.sqlite3'))
+TOKEN_BUDGET = int(os.getenv('TOKEN_BUDGET', 60000))  # tokens per user per window
+TOKEN_BUDGET_WINDOW = int(os.getenv('TOKEN_BUDGET_WINDOW', 3600))  # seconds
+BUCKET_SECONDS = 60
+# USD per million tokens
+PROMPT_TOKEN_PRICE = float(os.getenv('PROMPT_TOKEN_PRICE', 0.27))
+COMPLETION_TOKEN_PRICE = float(os.getenv('COMPLETION_TOKEN_PRICE', 1.10))
+
+class QuotaExceeded(Exception):
+    def __init__(self, retry_after):
+        super().__init__('Token budget exceeded. Please try again later.')
+        self.retry_after = retry_after
+
+def estimate_tokens(messages, max_tokens):
+    """Worst-case cost of a call: roughly 4 characters per prompt token plus the full completion"""
+    return sum(len(message['content']) for message in messages) // 4 + max_tokens
+
+def usage_cost(prompt_tokens, completion_tokens):
+    return (prompt_tokens * PROMPT_TOKEN_PRICE + completion_tokens * COMPLETION_TOKEN_PRICE) / 1_000_000
+
+class TokenAccountant:
+    def __init__(self, path, budget, window):
+        self.path = path
+        self.budget = budget
+        self.window = window
+        self.local = threading.local()
+        self.last_cleanup = 0.0
+        self.connection().executescript("""
+            CREATE TABLE IF NOT EXISTS usage (
+                user TEXT NOT NULL,
+                route TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                completion_tokens INTEGER NOT NULL DEFAULT 0,
+                calls INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user, bucket, route)
+            );
+            CREATE INDEX IF NOT EXISTS usage_bucket ON usage (bucket);
+            -- Estimates held by calls still in flight; a crashed worker's rows age out with the window
+            CREATE TABLE IF NOT EXISTS reservations (
+                id INTEGER PRIMARY KEY,
+                user TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                tokens INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS reservations_user ON reservations (user, bucket);
+        """)
+
+    def connection(self):
+        # One connection per thread; SQLite handles locking between workers
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        # IMMEDIATE takes the write lock up front, so the budget check and the
+        # write that follows it cannot interleave with another worker's
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def window_start(self):
+        return int((time.time() - self.window) // BUCKET_SECONDS) + 1
+
+    def used(self, user, conn=None):
+        """Tokens used plus tokens reserved by calls in flight, inside the window"""
+        conn = conn or self.connection()
+        start = self.window_start()
+        return conn.execute(
+            'SELECT (SELECT COALESCE(SUM(prompt_tokens + completion_tokens), 0) FROM usage WHERE user = ? AND bucket >= ?)'
+            ' + (SELECT COALESCE(SUM(tokens), 0) FROM reservations WHERE user = ? AND bucket >= ?)',
+            (user, start, user, start)
+        ).fetchone()[0]
+
+    def quota_exceeded(self, user, conn):
+        start = self.window_start()
+        oldest = conn.execute(
+            'SELECT MIN(bucket) FROM (SELECT bucket FROM usage WHERE user = ? AND bucket >= ?'
+            ' UNION ALL SELECT bucket FROM reservations WHERE user = ? AND bucket >= ?)',
+            (user, start, user, start)
+        ).fetchone()[0]
+        # The oldest bucket in the window is the first to free up
+        retry_after = oldest * BUCKET_SECONDS + self.window - time.time() if oldest is not None else BUCKET_SECONDS
+        return QuotaExceeded(max(1, int(retry_after)))
+
+    def check(self, user, estimate):
+        """Raise QuotaExceeded if a call costing up to estimate tokens would break the budget"""
+        conn = self.connection()
+        if self.used(user, conn) + estimate > self.budget:
+            raise self.quota_exceeded(user, conn)
+
+    def reserve(self, user, estimate):
+        """Check the budget and hold estimate tokens against it in one step; returns the reservation id"""
+        with self.transaction() as conn:
+            if self.used(user, conn) + estimate > self.budget:
+                raise self.quota_exceeded(user, conn)
+            return conn.execute(
+                'INSERT INTO reservations (user, bucket, tokens) VALUES (?, ?, ?)',
+                (user, int(time.time() // BUCKET_SECONDS), estimate)
+            ).lastrowid
+
+    def release(self, reservation):
+        """Give back a reservation for a call that never completed"""
+        self.connection().execute('DELETE FROM reservations WHERE id = ?', (reservation,))
+
+    def record(self, user, route, prompt_tokens, completion_tokens, reservation=None):
+        """Add a call's real usage, replacing its reservation if it had one"""
+        bucket = int(time.time() // BUCKET_SECONDS)
+        with self.transaction() as conn:
+            if reservation is not None:
+                conn.execute('DELETE FROM reservations WHERE id = ?', (reservation,))
+            conn.execute("""
+                INSERT INTO usage (user, route, bucket, prompt_tokens, completion_tokens, calls)
+                VALUES (?, ?, ?, ?, ?, 1)
+                ON CONFLICT (user, bucket, route) DO UPDATE SET
+                    prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                    completion_tokens = completion_tokens + excluded.completion_tokens,
+                    calls = calls + 1
+            """, (user, route, bucket, prompt_tokens, completion_tokens))
+            if time.time() - self.last_cleanup > self.window:
+                self.last_cleanup = time.time()
+                conn.execute('DELETE FROM usage WHERE bucket < ?', (self.window_start(),))
+                conn.execute('DELETE FROM reservations WHERE bucket < ?', (self.window_start(),))
+
+    def report(self, user=None, top=10):
+        """Usage inside the current window, overall or for one user"""
+        conn = self.connection()
+        start = self.window_start()
+        where, params = ('bucket >= ? AND user = ?', (start, user)) if user else ('bucket >= ?', (start,))
+        routes = {}
+        for route, prompt_tokens, completion_tokens, calls in conn.execute(
+                f'SELECT route, SUM(prompt_tokens), SUM(completion_tokens), SUM(calls) FROM usage WHERE {where} GROUP BY route',
+                params):
+            routes[route] = {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'calls': calls,
+                'cost_usd': round(usage_cost(prompt_tokens, completion_tokens), 6)
+            }
+        report = {
+            'window_seconds': self.window,
+            'budget_tokens': self.budget,
+            'routes': routes
+        }
+        if user:
+            used = sum(route['prompt_tokens'] + route['completion_tokens'] for route in routes.values())
+            report['used_tokens'] = used
+            report['remaining_tokens'] = max(0, self.budget - self.used(user, conn))  # net of calls in flight
+        else:
+            report['top_consumers'] = [
+                {
+                    'user': consumer,
+                    'tokens': prompt_tokens + completion_tokens,
+                    'cost_usd': round(usage_cost(prompt_tokens, completion_tokens), 6)
+                }
+                for consumer, prompt_tokens, completion_tokens in conn.execute(
+                    'SELECT user, SUM(prompt_tokens), SUM(completion_tokens) FROM usage WHERE bucket >= ? '
+                    'GROUP BY user ORDER BY SUM(prompt_tokens + completion_tokens) DESC LIMIT ?',
+                    (start, top))
+            ]
+        return report
+
+token_accountant = TokenAccountant(USAGE_DB_PATH, TOKEN_BUDGET, TOKEN_BUDGET_WINDOW)